@@ -6,14 +6,28 @@ Monitors backend API activity and automatically stops the EC2 instance
 after a configured period of inactivity to save costs.
 
 This script should be run as a systemd service on the EC2 instance.
+
+By default it watches the local host only. Set MONITOR_HOSTS_FILE to a JSON
+list of hosts to watch several Daytona hosts from one process, e.g.:
+
+    [
+      {"name": "daytona-1", "backend_url": "http://10.0.1.10:3001",
+       "daytona_api_url": "http://10.0.1.10:3000/api",
+       "daytona_api_key": "...", "instance_id": "i-0abc", "region": "us-east-1"},
+      {"name": "local", "local": true}
+    ]
+
+Each host is checked by its own asyncio task with its own idle state and
+schedule, so a slow host never delays the others.
 """
 
-import time
+import asyncio
 import logging
 import os
 import json
 import subprocess
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import requests
 
@@ -23,6 +37,16 @@ ACTIVITY_FILE = "/var/lib/daytona/last-activity.json"
 IDLE_THRESHOLD_MINUTES = int(os.environ.get('IDLE_THRESHOLD_MINUTES', '120'))  # 2 hours
 CHECK_INTERVAL_SECONDS = int(os.environ.get('CHECK_INTERVAL_SECONDS', '300'))  # 5 minutes
 BACKEND_URL = os.environ.get('BACKEND_URL', 'http://localhost:3001')
+DAYTONA_API_URL = os.environ.get('DAYTONA_API_URL', '')
+DAYTONA_API_KEY = os.environ.get('DAYTONA_API_KEY', '')
+MONITOR_HOSTS_FILE = os.environ.get('MONITOR_HOSTS_FILE', '')
+HOST_ACTIVITY_DIR = "/var/lib/daytona/hosts"
+PROBE_THREADS_PER_HOST = 2
+NETWORK_THRESHOLD_MB = int(os.environ.get('NETWORK_THRESHOLD_MB', '100'))
+GRACE_PERIOD_SECONDS = 60
+ACTIVITY_SCORE_THRESHOLD = float(os.environ.get('ACTIVITY_SCORE_THRESHOLD', '1.0'))
+EXPENSIVE_SIGNAL_COST = int(os.environ.get('EXPENSIVE_SIGNAL_COST', '5'))
+SIGNAL_OVERRIDES = json.loads(os.environ.get('ACTIVITY_SIGNAL_OVERRIDES') or '{}')
 
 # Setup logging
 logging.basicConfig(
@@ -36,211 +60,643 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def get_last_activity_time():
+class HostLogger(logging.LoggerAdapter):
+    """Prefixes log messages with the host name."""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['host']}] {msg}", kwargs
+
+
+# Activity signal registry
+#
+# Each signal is a probe that returns the last time it saw activity (or None).
+# A signal contributes its weight to the activity score while its timestamp is
+# within its freshness window. The instance counts as active when the combined
+# score reaches ACTIVITY_SCORE_THRESHOLD, so a single low-weight source (like
+# the always-200 health check) can no longer keep the instance alive alone.
+# Expensive signals are skipped when they cannot change the outcome: either
+# the score already proves activity, or even their full weight plus every
+# remaining signal could not reach the threshold. A probe that fails or times
+# out is "unknown": it contributes nothing, but a check where unknown signals
+# could have reached the threshold never counts as idle.
+SIGNAL_REGISTRY = []
+signal_cache = {}
+SIGNAL_OPTIONS = ('cost', 'timeout', 'weight', 'freshness_seconds', 'cache_cycles', 'requires')
+
+
+class ActivitySignal:
     """
-    Get the last activity timestamp from multiple sources:
-    1. Backend API health check timestamp
-    2. Last modified time of backend log file
-    3. Stored activity file
+    A registered activity source.
+
+    Attributes:
+        name (str): Signal name used in logs and overrides
+        probe (callable): Function taking (host, timeout) and returning a datetime or None
+        cost (int): Relative cost; signals run cheapest first
+        timeout (int): Seconds the probe may spend
+        weight (float): Score contributed while the signal is fresh
+        freshness_seconds (int): How long a timestamp keeps contributing;
+            defaults to two of the host's check intervals
+        cache_cycles (int): How many following checks reuse an expensive
+            signal's result; the lifetime allows half an interval of slack for
+            cycle duration and is capped below freshness so cached results
+            never go stale
+        requires (tuple): Host config keys that must be set for the signal to apply
+    """
+
+    def __init__(self, name, probe, cost=1, timeout=5, weight=1.0,
+                 freshness_seconds=None, cache_cycles=0, requires=()):
+        self.name = name
+        self.probe = probe
+        self.cost = cost
+        self.timeout = timeout
+        self.weight = weight
+        self.freshness_seconds = freshness_seconds
+        self.cache_cycles = cache_cycles
+        self.requires = tuple(requires)
+
+    @property
+    def expensive(self):
+        return self.cost >= EXPENSIVE_SIGNAL_COST
+
+    def applies_to(self, host):
+        return all(host.get(key) for key in self.requires)
+
+    def freshness_for(self, host):
+        return self.freshness_seconds or host['check_interval_seconds'] * 2
+
+    def cache_ttl_for(self, host):
+        if not self.cache_cycles:
+            return 0
+        ttl = (self.cache_cycles + 0.5) * host['check_interval_seconds']
+        return min(ttl, self.freshness_for(host) - 1)
+
+
+def register_signal(name, **options):
+    """
+    Decorator that registers a probe function as an activity signal.
+    Options can be overridden per signal via ACTIVITY_SIGNAL_OVERRIDES, e.g.
+    '{"backend_health": {"weight": 0}}'.
+
+    Args:
+        name (str): Signal name
+        **options: ActivitySignal attributes (cost, timeout, weight, ...)
+    """
+    def decorator(probe):
+        overrides = SIGNAL_OVERRIDES.get(name, {})
+        unknown = set(overrides) - set(SIGNAL_OPTIONS)
+        if unknown:
+            raise ValueError(
+                f"Unknown option(s) {sorted(unknown)} in ACTIVITY_SIGNAL_OVERRIDES "
+                f"for signal '{name}'; expected one of {list(SIGNAL_OPTIONS)}"
+            )
+        options.update(overrides)
+        SIGNAL_REGISTRY.append(ActivitySignal(name, probe, **options))
+        return probe
+    return decorator
+
+
+@register_signal('backend_health', cost=1, timeout=5, weight=0.25, freshness_seconds=60,
+                 requires=('backend_url',))
+def probe_backend_health(host, timeout):
+    """Backend responding to /health. Always on while the backend runs, so low weight."""
+    response = requests.get(f"{host['backend_url']}/health", timeout=timeout)
+    if response.status_code == 200:
+        host['log'].debug("Backend is responding to health checks")
+        return datetime.now()
+    return None
+
+
+@register_signal('backend_log', cost=1, timeout=1, weight=1.0, requires=('local',))
+def probe_backend_log(host, timeout):
+    """Last modified time of the backend log file (written on every request)."""
+    if not os.path.exists(BACKEND_LOG_FILE):
+        return None
+    log_mtime = datetime.fromtimestamp(os.path.getmtime(BACKEND_LOG_FILE))
+    host['log'].debug(f"Backend log last modified: {log_mtime}")
+    return log_mtime
+
+
+@register_signal('docker_containers', cost=10, timeout=10, weight=0.25, cache_cycles=1,
+                 requires=('local',))
+def probe_docker_containers(host, timeout):
+    """
+    Running Docker containers. Sandboxes may idle while running, so with the
+    default weights this is informational only and is skipped unless an
+    override raises its weight enough to affect the decision.
+    """
+    result = subprocess.run(
+        ['docker', 'ps', '--format', '{{.Names}}'],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode == 0 and result.stdout.strip():
+        container_count = len(result.stdout.strip().split('\n'))
+        host['log'].debug(f"Found {container_count} running containers")
+        return datetime.now()
+    return None
+
+
+@register_signal('daytona_workspaces', cost=10, timeout=10, weight=1.0, cache_cycles=1,
+                 requires=('daytona_api_url', 'daytona_api_key'))
+def probe_daytona_workspaces(host, timeout):
+    """Running Daytona workspaces, via the host's Daytona API."""
+    response = requests.get(
+        f"{host['daytona_api_url']}/workspace",
+        headers={'Authorization': f"Bearer {host['daytona_api_key']}"},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    running = [w for w in response.json() if w.get('state') == 'running']
+    if running:
+        host['log'].debug(f"Found {len(running)} running Daytona workspaces")
+        return datetime.now()
+    return None
+
+
+# Same cost as network_traffic in the stop Lambda
+@register_signal('network_traffic', cost=5, timeout=15, weight=1.0, cache_cycles=1,
+                 requires=('instance_id',))
+def probe_network_traffic(host, timeout):
+    """
+    CloudWatch NetworkIn over the last 30 minutes, like the stop Lambda.
+    Active at or above NETWORK_THRESHOLD_MB, and when no datapoints exist yet
+    (instance likely just started). Covers backend traffic on remote hosts.
+    """
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(minutes=30)
+    result = subprocess.run(
+        aws_command(host, 'cloudwatch', 'get-metric-statistics',
+                    '--namespace', 'AWS/EC2',
+                    '--metric-name', 'NetworkIn',
+                    '--dimensions', f"Name=InstanceId,Value={host['instance_id']}",
+                    '--start-time', start_time.isoformat(),
+                    '--end-time', end_time.isoformat(),
+                    '--period', '1800',
+                    '--statistics', 'Sum',
+                    '--output', 'json'),
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"get-metric-statistics failed: {result.stderr.strip()}")
+
+    datapoints = json.loads(result.stdout)['Datapoints']
+    if not datapoints:
+        host['log'].debug("No network data available, instance likely just started")
+        return datetime.now()
+
+    network_mb = datapoints[0]['Sum'] / (1024 * 1024)
+    host['log'].debug(f"Network traffic in last 30 min: {network_mb:.2f} MB")
+    return datetime.now() if network_mb >= NETWORK_THRESHOLD_MB else None
+
+
+def aws_command(host, *args):
+    """
+    Build an AWS CLI command for a host, adding its region when configured.
 
     Returns:
-        datetime: Last activity timestamp
+        list: Command arguments
     """
-    activity_times = []
+    command = ['aws', *args]
+    if host.get('region'):
+        command += ['--region', host['region']]
+    return command
 
-    # Check backend health endpoint
-    try:
-        response = requests.get(f"{BACKEND_URL}/health", timeout=5)
-        if response.status_code == 200:
-            # If backend responds, it's active now
-            activity_times.append(datetime.now())
-            logger.debug("Backend is responding to health checks")
-    except Exception as e:
-        logger.debug(f"Backend health check failed: {e}")
 
-    # Check backend log file modification time
+class SignalUnknown(Exception):
+    """Raised when a signal probe fails or times out."""
+
+
+async def run_signal(signal, host, now, use_cache=True):
+    """
+    Run a signal probe on the host's own probe executor, reusing a cached
+    result for expensive signals unless use_cache is False.
+
+    A probe abandoned on timeout keeps its worker until it returns, but only
+    the host's own executor fills up, so a hanging host never delays probes
+    (or eats into the timeouts) of other hosts.
+
+    Returns:
+        tuple: (timestamp or None, whether the result came from cache)
+
+    Raises:
+        SignalUnknown: If the probe fails or times out
+    """
+    cache_key = (host['name'], signal.name)
+    cached = signal_cache.get(cache_key)
+    if use_cache and cached and (now - cached[0]).total_seconds() < signal.cache_ttl_for(host):
+        return cached[1], True
+
     try:
-        if os.path.exists(BACKEND_LOG_FILE):
-            log_mtime = os.path.getmtime(BACKEND_LOG_FILE)
-            activity_times.append(datetime.fromtimestamp(log_mtime))
-            logger.debug(f"Backend log last modified: {datetime.fromtimestamp(log_mtime)}")
+        timestamp = await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(
+                host['executor'], signal.probe, host, signal.timeout
+            ),
+            timeout=signal.timeout + 1
+        )
     except Exception as e:
-        logger.debug(f"Could not check log file: {e}")
+        # Failures are not cached so the next cycle probes again
+        raise SignalUnknown(f"{e!r}") from e
+
+    if signal.cache_cycles:
+        signal_cache[cache_key] = (now, timestamp)
+    return timestamp, False
+
+
+async def evaluate_activity_signals(host, use_cache=True):
+    """
+    Evaluate the signals that apply to a host cheapest first and combine them
+    into a score. Expensive signals are skipped once the score already proves
+    activity.
+
+    Returns:
+        tuple: (score, unknown_weight, contributions, last_seen) where
+        unknown_weight sums the weights of failed probes, contributions maps
+        signal name to a short description for logging, and last_seen is the
+        newest timestamp from a signal whose weight alone reaches the
+        threshold, even when it is no longer fresh
+    """
+    now = datetime.now()
+    score = 0.0
+    unknown_weight = 0.0
+    contributions = {}
+    last_seen = None
+
+    signals = sorted(
+        (signal for signal in SIGNAL_REGISTRY if signal.applies_to(host)),
+        key=lambda s: s.cost
+    )
+    remaining_weight = sum(signal.weight for signal in signals)
+
+    for signal in signals:
+        remaining_weight -= signal.weight
+        if signal.expensive and score >= ACTIVITY_SCORE_THRESHOLD:
+            contributions[signal.name] = "skipped"
+            continue
+        if signal.expensive and (
+                score + unknown_weight + signal.weight + remaining_weight < ACTIVITY_SCORE_THRESHOLD):
+            contributions[signal.name] = "skipped (cannot reach threshold)"
+            continue
+
+        try:
+            timestamp, from_cache = await run_signal(signal, host, now, use_cache)
+        except SignalUnknown as e:
+            unknown_weight += signal.weight
+            contributions[signal.name] = f"unknown ({e})"
+            continue
+        if timestamp is None:
+            contributions[signal.name] = f"0.00 (no activity{', cached' if from_cache else ''})"
+            continue
+
+        if signal.weight >= ACTIVITY_SCORE_THRESHOLD:
+            last_seen = max(last_seen or timestamp, timestamp)
+
+        age = max((now - timestamp).total_seconds(), 0)
+        contribution = signal.weight if age <= signal.freshness_for(host) else 0.0
+        score += contribution
+        contributions[signal.name] = (
+            f"{contribution:.2f} (age {age:.0f}s{', cached' if from_cache else ''})"
+        )
+
+    return score, unknown_weight, contributions, last_seen
+
 
-    # Check stored activity file
+def read_activity_file(host):
+    """
+    Read the last recorded activity timestamp from a host's activity file.
+
+    Returns:
+        datetime: Stored activity timestamp, or None if unavailable
+    """
     try:
-        if os.path.exists(ACTIVITY_FILE):
-            with open(ACTIVITY_FILE, 'r') as f:
+        if os.path.exists(host['activity_file']):
+            with open(host['activity_file'], 'r') as f:
                 data = json.load(f)
-                stored_time = datetime.fromisoformat(data['last_activity'])
-                activity_times.append(stored_time)
-                logger.debug(f"Stored activity time: {stored_time}")
+                return datetime.fromisoformat(data['last_activity'])
     except Exception as e:
-        logger.debug(f"Could not read activity file: {e}")
+        host['log'].debug(f"Could not read activity file: {e}")
+    return None
 
-    # Check Docker container stats (if containers are running, there's activity)
-    try:
-        result = subprocess.run(
-            ['docker', 'ps', '--format', '{{.Names}}'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            container_count = len(result.stdout.strip().split('\n'))
-            if container_count > 0:
-                logger.debug(f"Found {container_count} running containers")
-                # Don't add activity time just because containers are running
-                # Only add if backend is actually being used
-    except Exception as e:
-        logger.debug(f"Could not check Docker containers: {e}")
 
-    # Return the most recent activity time
-    if activity_times:
-        most_recent = max(activity_times)
-        logger.info(f"Last activity detected: {most_recent}")
-        return most_recent
-    else:
-        # No activity detected, return stored time or very old time
-        logger.warning("No activity detected from any source")
-        return datetime.now() - timedelta(days=1)
+async def get_last_activity_time(host, use_cache=True):
+    """
+    Get the last activity timestamp for a host.
 
+    If the weighted signal score reaches ACTIVITY_SCORE_THRESHOLD the host
+    is active now. Otherwise the newest of the last recorded activity time
+    and any stale timestamp from a signal that is decisive on its own (such
+    as the backend log mtime) is used. With neither, idle time counts from
+    monitor start.
 
-def update_activity_file(timestamp):
+    Returns:
+        datetime: Last activity timestamp, or None if failed probes could
+        have proven activity
     """
-    Update the activity file with the latest timestamp.
+    log = host['log']
+    score, unknown_weight, contributions, last_seen = await evaluate_activity_signals(
+        host, use_cache
+    )
+    breakdown = ", ".join(f"{name}={value}" for name, value in contributions.items())
+    log.info(f"Activity score {score:.2f} (threshold {ACTIVITY_SCORE_THRESHOLD:.2f}): {breakdown}")
+
+    if score >= ACTIVITY_SCORE_THRESHOLD:
+        return datetime.now()
+
+    if score + unknown_weight >= ACTIVITY_SCORE_THRESHOLD:
+        log.warning(f"Activity unknown: signals worth {unknown_weight:.2f} failed, not counting as idle")
+        return None
+
+    candidates = [t for t in (read_activity_file(host), last_seen) if t]
+    if candidates:
+        last_activity = max(candidates)
+        log.info(f"Last activity detected: {last_activity}")
+        return last_activity
+
+    # No activity recorded yet, count idle time from monitor start
+    log.warning("No activity recorded, using monitor start time")
+    return host['started_at']
+
+
+def update_activity_file(host, timestamp):
+    """
+    Update a host's activity file with the latest timestamp.
 
     Args:
+        host (dict): Host config
         timestamp (datetime): Activity timestamp
     """
     try:
-        os.makedirs(os.path.dirname(ACTIVITY_FILE), exist_ok=True)
-        with open(ACTIVITY_FILE, 'w') as f:
+        os.makedirs(os.path.dirname(host['activity_file']), exist_ok=True)
+        with open(host['activity_file'], 'w') as f:
             json.dump({
                 'last_activity': timestamp.isoformat(),
                 'last_check': datetime.now().isoformat()
             }, f, indent=2)
-        logger.debug(f"Updated activity file with timestamp: {timestamp}")
+        host['log'].debug(f"Updated activity file with timestamp: {timestamp}")
     except Exception as e:
-        logger.error(f"Could not update activity file: {e}")
+        host['log'].error(f"Could not update activity file: {e}")
+
+
+def get_local_instance_identity():
+    """
+    Get the current EC2 instance ID and region from the metadata service.
+
+    Returns:
+        tuple: (instance_id, region)
+    """
+    response = requests.get(
+        'http://169.254.169.254/latest/meta-data/instance-id',
+        timeout=2
+    )
+    instance_id = response.text.strip()
+
+    response = requests.get(
+        'http://169.254.169.254/latest/meta-data/placement/region',
+        timeout=2
+    )
+    region = response.text.strip()
+
+    return instance_id, region
 
 
-def stop_instance():
+async def stop_instance(host):
     """
-    Stop the current EC2 instance using AWS CLI.
-    This requires the instance to have an IAM role with ec2:StopInstances permission.
+    Stop a host's EC2 instance using AWS CLI. Local hosts without an
+    instance_id are resolved from the metadata service.
+    This requires an IAM role with ec2:StopInstances permission.
     """
+    log = host['log']
     try:
-        # Get instance ID from metadata service
-        response = requests.get(
-            'http://169.254.169.254/latest/meta-data/instance-id',
-            timeout=2
-        )
-        instance_id = response.text.strip()
+        instance_id, region = host.get('instance_id'), host.get('region')
+        if not instance_id:
+            instance_id, region = await asyncio.to_thread(get_local_instance_identity)
 
-        logger.info(f"Stopping instance {instance_id} due to inactivity...")
+        log.info(f"Stopping instance {instance_id} due to inactivity...")
 
-        # Get region from metadata
-        response = requests.get(
-            'http://169.254.169.254/latest/meta-data/placement/region',
-            timeout=2
-        )
-        region = response.text.strip()
-
-        # Stop the instance
-        result = subprocess.run(
-            ['aws', 'ec2', 'stop-instances',
-             '--instance-ids', instance_id,
-             '--region', region],
-            capture_output=True,
-            text=True,
-            timeout=30
+        command = aws_command({'region': region}, 'ec2', 'stop-instances',
+                              '--instance-ids', instance_id)
+
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
 
-        if result.returncode == 0:
-            logger.info(f"Successfully initiated instance stop: {instance_id}")
+        if process.returncode == 0:
+            log.info(f"Successfully initiated instance stop: {instance_id}")
             return True
         else:
-            logger.error(f"Failed to stop instance: {result.stderr}")
+            log.error(f"Failed to stop instance: {stderr.decode().strip()}")
             return False
 
     except Exception as e:
-        logger.error(f"Error stopping instance: {e}")
+        log.error(f"Error stopping instance: {e}")
         return False
 
 
-def check_and_stop_if_idle():
+async def get_instance_state(host):
     """
-    Check if the instance has been idle for longer than the threshold.
-    If so, stop the instance.
+    Get the EC2 state of a remote host's instance.
 
     Returns:
-        bool: True if instance should continue running, False if stopped
+        str: Instance state (e.g. 'running', 'stopped'), or None if unknown
     """
     try:
-        last_activity = get_last_activity_time()
+        process = await asyncio.create_subprocess_exec(
+            *aws_command(host, 'ec2', 'describe-instances',
+                         '--instance-ids', host['instance_id'],
+                         '--query', 'Reservations[0].Instances[0].State.Name',
+                         '--output', 'text'),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
+        if process.returncode == 0:
+            return stdout.decode().strip()
+        host['log'].warning(f"Could not get instance state: {stderr.decode().strip()}")
+    except Exception as e:
+        host['log'].warning(f"Could not get instance state: {e}")
+    return None
+
+
+async def check_and_stop_if_idle(host):
+    """
+    Check if a host has been idle for longer than its threshold.
+    If so, stop its instance.
+
+    Returns:
+        bool: True if the host is still running, False if stopped
+    """
+    log = host['log']
+    threshold = host['idle_threshold_minutes']
+    try:
+        last_activity = await get_last_activity_time(host)
+        if last_activity is None:
+            return True
+
         now = datetime.now()
         idle_duration = now - last_activity
         idle_minutes = idle_duration.total_seconds() / 60
 
-        logger.info(f"Idle for {idle_minutes:.1f} minutes (threshold: {IDLE_THRESHOLD_MINUTES} minutes)")
+        log.info(f"Idle for {idle_minutes:.1f} minutes (threshold: {threshold} minutes)")
 
         # Update activity file
-        update_activity_file(last_activity)
+        update_activity_file(host, last_activity)
 
         # Check if idle threshold exceeded
-        if idle_minutes >= IDLE_THRESHOLD_MINUTES:
-            logger.warning(f"Instance has been idle for {idle_minutes:.1f} minutes, initiating shutdown...")
+        if idle_minutes >= threshold:
+            log.warning(f"Instance has been idle for {idle_minutes:.1f} minutes, initiating shutdown...")
 
             # Give a grace period for any in-flight requests
-            logger.info("Waiting 60 seconds before shutdown (grace period)...")
-            time.sleep(60)
-
-            # Final check
-            final_activity = get_last_activity_time()
-            if (datetime.now() - final_activity).total_seconds() / 60 >= IDLE_THRESHOLD_MINUTES:
-                if stop_instance():
-                    logger.info("Instance stop initiated successfully")
+            log.info(f"Waiting {GRACE_PERIOD_SECONDS} seconds before shutdown (grace period)...")
+            await asyncio.sleep(GRACE_PERIOD_SECONDS)
+
+            # Final check, probing every signal again rather than trusting the cache
+            final_activity = await get_last_activity_time(host, use_cache=False)
+            if final_activity is None:
+                log.info("Activity unknown after grace period, canceling shutdown")
+            elif (datetime.now() - final_activity).total_seconds() / 60 >= threshold:
+                if await stop_instance(host):
+                    log.info("Instance stop initiated successfully")
                     return False
                 else:
-                    logger.error("Failed to stop instance, will retry on next check")
+                    log.error("Failed to stop instance, will retry on next check")
             else:
-                logger.info("Activity detected during grace period, canceling shutdown")
+                log.info("Activity detected during grace period, canceling shutdown")
 
         return True
 
     except Exception as e:
-        logger.error(f"Error in check_and_stop_if_idle: {e}", exc_info=True)
+        log.error(f"Error in check_and_stop_if_idle: {e}", exc_info=True)
         return True  # Continue running on error
 
 
-def main():
+async def monitor_host(host):
     """
-    Main loop for the auto-stop monitoring service.
+    Monitoring loop for a single host, running on its own schedule.
+
+    The local host's loop ends once it stops its own instance. Remote hosts
+    keep being watched but are skipped while their instance is not running;
+    their idle clock restarts from the time they are next seen running.
     """
-    logger.info("="*60)
-    logger.info("Auto-Stop Monitoring Service Started")
-    logger.info(f"Idle threshold: {IDLE_THRESHOLD_MINUTES} minutes")
-    logger.info(f"Check interval: {CHECK_INTERVAL_SECONDS} seconds")
-    logger.info("="*60)
+    log = host['log']
+    interval = host['check_interval_seconds']
 
     while True:
         try:
-            should_continue = check_and_stop_if_idle()
-            if not should_continue:
-                logger.info("Instance stop initiated, exiting monitor")
-                break
+            state = None if host.get('local') else await get_instance_state(host)
+            if state and state != 'running':
+                log.info(f"Instance is {state}, skipping check")
+                update_activity_file(host, datetime.now())
+            elif not await check_and_stop_if_idle(host) and host.get('local'):
+                log.info("Instance stop initiated, exiting monitor")
+                return
 
             # Wait before next check
-            logger.debug(f"Sleeping for {CHECK_INTERVAL_SECONDS} seconds...")
-            time.sleep(CHECK_INTERVAL_SECONDS)
+            log.debug(f"Sleeping for {interval} seconds...")
+            await asyncio.sleep(interval)
 
-        except KeyboardInterrupt:
-            logger.info("Received interrupt signal, shutting down gracefully...")
-            break
         except Exception as e:
-            logger.error(f"Unexpected error in main loop: {e}", exc_info=True)
-            time.sleep(CHECK_INTERVAL_SECONDS)
+            log.error(f"Unexpected error in monitor loop: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+def build_host(config):
+    """
+    Fill in defaults for a host config entry.
+
+    Args:
+        config (dict): Host entry from MONITOR_HOSTS_FILE
+
+    Returns:
+        dict: Host config with defaults, logger and idle state
+    """
+    host = dict(config)
+    if not host.get('name'):
+        raise ValueError(f"Host entry is missing 'name': {config}")
+
+    if host.get('local'):
+        host.setdefault('backend_url', BACKEND_URL)
+        host.setdefault('daytona_api_url', DAYTONA_API_URL)
+        host.setdefault('daytona_api_key', DAYTONA_API_KEY)
+        host.setdefault('activity_file', ACTIVITY_FILE)
+    else:
+        host.setdefault('activity_file', os.path.join(HOST_ACTIVITY_DIR, f"{host['name']}.json"))
+        if not host.get('instance_id'):
+            raise ValueError(f"Remote host {host['name']} is missing 'instance_id'")
+
+    host.setdefault('region', os.environ.get('AWS_REGION', ''))
+    host.setdefault('idle_threshold_minutes', IDLE_THRESHOLD_MINUTES)
+    host.setdefault('check_interval_seconds', CHECK_INTERVAL_SECONDS)
+    host['started_at'] = datetime.now()
+    host['log'] = HostLogger(logger, {'host': host['name']})
+    host['executor'] = ThreadPoolExecutor(
+        max_workers=PROBE_THREADS_PER_HOST,
+        thread_name_prefix=f"probe-{host['name']}"
+    )
+
+    # A host whose signals cannot reach the threshold would always look idle
+    applicable = [signal for signal in SIGNAL_REGISTRY if signal.applies_to(host)]
+    max_score = sum(signal.weight for signal in applicable)
+    if max_score < ACTIVITY_SCORE_THRESHOLD:
+        raise ValueError(
+            f"Host {host['name']} can score at most {max_score:.2f} from "
+            f"[{', '.join(signal.name for signal in applicable)}], below the "
+            f"activity threshold {ACTIVITY_SCORE_THRESHOLD:.2f}; it would be "
+            "stopped even while in use"
+        )
+    return host
+
+
+def load_hosts():
+    """
+    Load the hosts to monitor from MONITOR_HOSTS_FILE, or the local host only
+    when it is not set.
+
+    Returns:
+        list: Host configs
+    """
+    if not MONITOR_HOSTS_FILE:
+        return [build_host({'name': 'local', 'local': True})]
+
+    with open(MONITOR_HOSTS_FILE, 'r') as f:
+        configs = json.load(f)
+
+    hosts = [build_host(config) for config in configs]
+    names = [host['name'] for host in hosts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate host names in {MONITOR_HOSTS_FILE}: {names}")
+    return hosts
+
+
+async def run_monitor(hosts):
+    """
+    Run one monitoring task per host concurrently.
+    """
+    await asyncio.gather(*(monitor_host(host) for host in hosts))
+
+
+def main():
+    """
+    Main entry point for the auto-stop monitoring service.
+    """
+    hosts = load_hosts()
+
+    logger.info("="*60)
+    logger.info("Auto-Stop Monitoring Service Started")
+    logger.info(f"Idle threshold: {IDLE_THRESHOLD_MINUTES} minutes")
+    logger.info(f"Check interval: {CHECK_INTERVAL_SECONDS} seconds")
+    logger.info(f"Activity signals: {', '.join(s.name for s in SIGNAL_REGISTRY)}")
+    logger.info(f"Hosts: {', '.join(host['name'] for host in hosts)}")
+    logger.info("="*60)
+
+    try:
+        asyncio.run(run_monitor(hosts))
+    except KeyboardInterrupt:
+        logger.info("Received interrupt signal, shutting down gracefully...")
 
 
 if __name__ == '__main__':
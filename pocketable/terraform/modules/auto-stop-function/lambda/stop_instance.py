@@ -4,15 +4,81 @@ import logging
 import urllib.request
 import urllib.error
 import os
+from functools import lru_cache
 from datetime import datetime, timedelta
+from botocore.config import Config
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 ec2 = boto3.client('ec2')
-cloudwatch = boto3.client('cloudwatch')
 
-def check_daytona_workspaces(instance_public_ip, api_key):
+NETWORK_THRESHOLD_MB = 100
+ACTIVITY_SCORE_THRESHOLD = float(os.environ.get('ACTIVITY_SCORE_THRESHOLD', '1.0'))
+EXPENSIVE_SIGNAL_COST = 5
+SIGNAL_OVERRIDES = json.loads(os.environ.get('ACTIVITY_SIGNAL_OVERRIDES') or '{}')
+
+# Activity signal registry. Each probe returns the last time it saw activity
+# (or None) plus details for the response body. A fresh signal
+# contributes its weight to the activity score; the instance is stopped when
+# the score stays below ACTIVITY_SCORE_THRESHOLD. Expensive signals are skipped
+# once cheaper signals prove activity. Results showing activity are cached
+# across warm invocations; idle results are never reused, so a stop is always
+# based on fresh probes.
+SIGNAL_REGISTRY = []
+signal_cache = {}
+
+SIGNAL_OPTIONS = ('cost', 'timeout', 'weight', 'freshness_seconds', 'cache_seconds')
+
+class ActivitySignal:
+    """
+    A registered activity source with its cost, timeout, weight, freshness
+    window and cache lifetime.
+    """
+
+    def __init__(self, name, probe, cost=1, timeout=10, weight=1.0,
+                 freshness_seconds=1800, cache_seconds=0):
+        self.name = name
+        self.probe = probe
+        self.cost = cost
+        self.timeout = timeout
+        self.weight = weight
+        self.freshness_seconds = freshness_seconds
+        self.cache_seconds = cache_seconds
+
+def register_signal(name, **options):
+    """
+    Decorator that registers a probe function as an activity signal.
+    Probes take (target, timeout) and return (timestamp or None, details).
+    Options can be overridden per signal via ACTIVITY_SIGNAL_OVERRIDES, e.g.
+    '{"network_traffic": {"weight": 0.5}}'.
+    """
+    def decorator(probe):
+        overrides = SIGNAL_OVERRIDES.get(name, {})
+        unknown = set(overrides) - set(SIGNAL_OPTIONS)
+        if unknown:
+            raise ValueError(
+                f"Unknown option(s) {sorted(unknown)} in ACTIVITY_SIGNAL_OVERRIDES "
+                f"for signal '{name}'; expected one of {list(SIGNAL_OPTIONS)}"
+            )
+        options.update(overrides)
+        SIGNAL_REGISTRY.append(ActivitySignal(name, probe, **options))
+        return probe
+    return decorator
+
+@lru_cache(maxsize=None)
+def cloudwatch_client(timeout):
+    """
+    CloudWatch client whose calls give up after the signal's timeout instead
+    of boto3's default timeouts and retries.
+    """
+    return boto3.client('cloudwatch', config=Config(
+        connect_timeout=timeout,
+        read_timeout=timeout,
+        retries={'max_attempts': 1}
+    ))
+
+def check_daytona_workspaces(instance_public_ip, api_key, timeout=10):
     """
     Check Daytona API for active workspaces.
 
@@ -24,7 +90,7 @@ def check_daytona_workspaces(instance_public_ip, api_key):
         req = urllib.request.Request(url)
         req.add_header('Authorization', f'Bearer {api_key}')
 
-        with urllib.request.urlopen(req, timeout=10) as response:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
             workspaces = json.loads(response.read().decode())
 
         active_workspaces = [w for w in workspaces if w.get('state') == 'running']
@@ -44,11 +110,110 @@ def check_daytona_workspaces(instance_public_ip, api_key):
         # On error, be conservative and assume workspaces exist
         return 1, 1, {'error': str(e)}
 
+# Same cost as network_traffic in the auto-stop monitor; it still runs before
+# the pricier Daytona API check
+@register_signal('network_traffic', cost=5, weight=1.0, freshness_seconds=1800)
+def probe_network_traffic(target, timeout):
+    """
+    NetworkIn over the last 30 minutes. Active at or above NETWORK_THRESHOLD_MB,
+    and when no datapoints exist yet (instance likely just started).
+    """
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(minutes=30)
+
+    response = cloudwatch_client(timeout).get_metric_statistics(
+        Namespace='AWS/EC2',
+        MetricName='NetworkIn',
+        Dimensions=[{'Name': 'InstanceId', 'Value': target['instance_id']}],
+        StartTime=start_time,
+        EndTime=end_time,
+        Period=1800,  # 30 minutes
+        Statistics=['Sum']
+    )
+
+    if not response['Datapoints']:
+        logger.info("No network data available, instance likely just started")
+        return end_time, {'network_mb': None}
+
+    network_bytes = response['Datapoints'][0]['Sum']
+    network_mb = network_bytes / (1024 * 1024)  # Convert to MB
+    logger.info(f"Network traffic in last 30 min: {network_bytes} bytes ({network_mb:.2f} MB)")
+    details = {
+        'network_mb': round(network_mb, 2),
+        'network_threshold_mb': NETWORK_THRESHOLD_MB
+    }
+
+    return (end_time if network_mb >= NETWORK_THRESHOLD_MB else None), details
+
+@register_signal('daytona_workspaces', cost=10, weight=1.0, freshness_seconds=1800,
+                 cache_seconds=600)
+def probe_daytona_workspaces(target, timeout):
+    """Running Daytona workspaces, via the Daytona API on the instance."""
+    if not (target['daytona_api_key'] and target['instance_public_ip']):
+        logger.warning("Daytona API credentials not configured, skipping workspace check")
+        return None, {}
+
+    active_workspaces, total_workspaces, workspace_states = check_daytona_workspaces(
+        target['instance_public_ip'],
+        target['daytona_api_key'],
+        timeout
+    )
+    details = {
+        'active_workspaces': active_workspaces,
+        'total_workspaces': total_workspaces,
+        'workspace_states': workspace_states
+    }
+
+    return (datetime.utcnow() if active_workspaces > 0 else None), details
+
+def evaluate_activity_signals(target):
+    """
+    Evaluate registered signals cheapest first and combine them into a score.
+
+    Returns:
+        tuple: (score, contributions, details) where contributions maps signal
+        name to its score contribution (None when skipped) and details merges
+        the probe details
+    """
+    now = datetime.utcnow()
+    score = 0.0
+    contributions = {}
+    details = {}
+
+    for signal in sorted(SIGNAL_REGISTRY, key=lambda s: s.cost):
+        if signal.cost >= EXPENSIVE_SIGNAL_COST and score >= ACTIVITY_SCORE_THRESHOLD:
+            contributions[signal.name] = None
+            continue
+
+        cache_key = (target['instance_id'], signal.name)
+        cached = signal_cache.get(cache_key)
+        if cached and (now - cached[0]).total_seconds() < signal.cache_seconds:
+            timestamp, signal_details = cached[1]
+        else:
+            timestamp, signal_details = signal.probe(target, signal.timeout)
+            if signal.cache_seconds and timestamp is not None:
+                signal_cache[cache_key] = (now, (timestamp, signal_details))
+        details.update(signal_details)
+
+        fresh = timestamp is not None and (now - timestamp).total_seconds() <= signal.freshness_seconds
+        contribution = signal.weight if fresh else 0.0
+        score += contribution
+        contributions[signal.name] = contribution
+
+    logger.info(
+        f"Activity score {score:.2f} (threshold {ACTIVITY_SCORE_THRESHOLD:.2f}): "
+        + ", ".join(
+            f"{name}={'skipped' if value is None else f'{value:.2f}'}"
+            for name, value in contributions.items()
+        )
+    )
+    return score, contributions, details
+
 def lambda_handler(event, context):
     """
-    Lambda function to stop EC2 instance using hybrid approach.
+    Lambda function to stop EC2 instance based on weighted activity signals.
 
-    Stops instance when BOTH conditions are met:
+    With the default weights the instance stops when BOTH conditions are met:
     1. No active Daytona workspaces (state != 'running')
     2. Network traffic < 100 MB in last 30 minutes
 
@@ -96,59 +261,15 @@ def lambda_handler(event, context):
                 })
             }
 
-        # Check NetworkIn metric for last 30 minutes
-        end_time = datetime.utcnow()
-        start_time = end_time - timedelta(minutes=30)
-
-        response = cloudwatch.get_metric_statistics(
-            Namespace='AWS/EC2',
-            MetricName='NetworkIn',
-            Dimensions=[{'Name': 'InstanceId', 'Value': instance_id}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=1800,  # 30 minutes
-            Statistics=['Sum']
-        )
-
-        # Check if there's network activity
-        if not response['Datapoints']:
-            logger.info("No network data available, instance likely just started")
-            return {
-                'statusCode': 200,
-                'body': json.dumps({
-                    'status': 'active',
-                    'message': 'No metrics yet, assuming active',
-                    'instance_id': instance_id
-                })
-            }
-
-        network_bytes = response['Datapoints'][0]['Sum']
-        network_mb = network_bytes / (1024 * 1024)  # Convert to MB
-        logger.info(f"Network traffic in last 30 min: {network_bytes} bytes ({network_mb:.2f} MB)")
-
-        # Check Daytona workspaces if API credentials are available
-        active_workspaces = 0
-        total_workspaces = 0
-        workspace_states = {}
-
-        if daytona_api_key and instance_public_ip:
-            active_workspaces, total_workspaces, workspace_states = check_daytona_workspaces(
-                instance_public_ip,
-                daytona_api_key
-            )
-        else:
-            logger.warning("Daytona API credentials not configured, skipping workspace check")
-
-        # Hybrid approach: Stop only if BOTH conditions are met
-        # 1. No active workspaces
-        # 2. Network traffic < 100 MB
-        should_stop = active_workspaces == 0 and network_mb < 100
+        target = {
+            'instance_id': instance_id,
+            'daytona_api_key': daytona_api_key,
+            'instance_public_ip': instance_public_ip
+        }
+        score, contributions, details = evaluate_activity_signals(target)
 
-        if should_stop:
-            logger.info(
-                f"Instance idle - stopping {instance_id}. "
-                f"Active workspaces: {active_workspaces}, Network: {network_mb:.2f} MB"
-            )
+        if score < ACTIVITY_SCORE_THRESHOLD:
+            logger.info(f"Instance idle - stopping {instance_id}. Activity score: {score:.2f}")
             ec2.stop_instances(InstanceIds=[instance_id])
 
             return {
@@ -157,22 +278,14 @@ def lambda_handler(event, context):
                     'status': 'stopped',
                     'message': 'Instance stopped due to inactivity',
                     'instance_id': instance_id,
-                    'network_mb': round(network_mb, 2),
-                    'network_threshold_mb': 100,
-                    'active_workspaces': active_workspaces,
-                    'total_workspaces': total_workspaces,
-                    'workspace_states': workspace_states
+                    'activity_score': score,
+                    'signal_contributions': contributions,
+                    **details
                 })
             }
 
         # Instance still active - log reason
-        reason = []
-        if active_workspaces > 0:
-            reason.append(f"{active_workspaces} active workspace(s)")
-        if network_mb >= 100:
-            reason.append(f"high network traffic ({network_mb:.2f} MB)")
-
-        reason_str = " and ".join(reason) if reason else "unknown"
+        reason_str = " and ".join(name for name, value in contributions.items() if value)
         logger.info(f"Instance active: {reason_str}")
 
         return {
@@ -181,10 +294,9 @@ def lambda_handler(event, context):
                 'status': 'active',
                 'message': f'Instance still active: {reason_str}',
                 'instance_id': instance_id,
-                'network_mb': round(network_mb, 2),
-                'active_workspaces': active_workspaces,
-                'total_workspaces': total_workspaces,
-                'workspace_states': workspace_states
+                'activity_score': score,
+                'signal_contributions': contributions,
+                **details
             })
         }
 
@@ -76,8 +76,10 @@ resource "aws_lambda_function" "auto_stop" {
 
   environment {
     variables = {
-      DAYTONA_API_KEY     = var.daytona_api_key
-      INSTANCE_PUBLIC_IP  = var.instance_public_ip
+      DAYTONA_API_KEY           = var.daytona_api_key
+      INSTANCE_PUBLIC_IP        = var.instance_public_ip
+      ACTIVITY_SCORE_THRESHOLD  = tostring(var.activity_score_threshold)
+      ACTIVITY_SIGNAL_OVERRIDES = jsonencode(var.activity_signal_overrides)
     }
   }
 
@@ -18,3 +18,15 @@ variable "instance_public_ip" {
   description = "Public IP address of the EC2 instance for Daytona API calls"
   type        = string
 }
+
+variable "activity_score_threshold" {
+  description = "Combined activity signal score at or above which the instance counts as active"
+  type        = number
+  default     = 1.0
+}
+
+variable "activity_signal_overrides" {
+  description = "Per-signal overrides keyed by signal name, e.g. { network_traffic = { weight = 0.5 } }"
+  type        = any
+  default     = {}
+}